@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+#
+# Benchmark: most recent file in a large directory
+# Creates a directory with many empty .csv and .txt files and a subdirectory, and measures
+# getRecentFileInDirectory() without filter, with a suffix filter and recursively.
+#
+# Usage:  $ python3 benchmarks/bench_files_recent.py [--files 50000]
+#
+import sys, os
+import tempfile, time
+from pathlib import Path
+
+# Load the framework from FRAMEWORK_PATH, or from the parent directory of this benchmark
+sys.path.insert(0, os.environ.get('FRAMEWORK_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from boilerplate_app import AppBoilerplate as Boilerplate
+
+class app(Boilerplate):
+  def __init__(self) -> None:
+    super().__init__()
+    self.getArgumentParser().add_argument('--files', type=int, default=50000, help='Number of files in the directory')
+    self.getArgumentParser().add_argument('--repeat', type=int, default=3, help='Runs per measurement, the best run is reported')
+    self.run()
+    with tempfile.TemporaryDirectory() as directory:
+      self.createFiles(Path(directory), self.getArgument('files'))
+      for name, filter, recursive in (('no filter', None, False), ('csv filter', 'csv', False), ('recursive csv', 'csv', True)):
+        best = None
+        for run in range(self.getArgument('repeat')):
+          start = time.perf_counter()
+          result = self.getRecentFileInDirectory(directory, filter=filter, recursive=recursive)
+          duration = time.perf_counter() - start
+          best = duration if best is None or duration < best else best
+        self.print(name.ljust(14) + ('%.3f s' % best).rjust(9) + '  ' + (result.name if result is not None else 'None'))
+        self.flush()
+
+  # Half of the files are .csv, a tenth of the files is placed in a subdirectory
+  def createFiles(self, directory, files):
+    (directory / 'sub').mkdir()
+    for number in range(files):
+      target = directory / 'sub' if number % 10 == 0 else directory
+      open(target / ('file' + str(number) + ('.csv' if number % 2 == 0 else '.txt')), 'w').close()
+
+app = app()
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+#
+# Benchmark: disabled debug messages
+# Measures the cost per call of debug() when debug output is not shown (default display
+# level, no logfile), with a concatenated message and with a lazy %-style message.
+#
+# Usage:  $ python3 benchmarks/bench_logging_debug.py [--calls 1000000]
+#
+import sys, os
+import timeit
+
+# Load the framework from FRAMEWORK_PATH, or from the parent directory of this benchmark
+sys.path.insert(0, os.environ.get('FRAMEWORK_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from boilerplate_app import AppBoilerplate as Boilerplate
+
+class app(Boilerplate):
+  def __init__(self) -> None:
+    super().__init__()
+    self.getArgumentParser().add_argument('--calls', type=int, default=1000000, help='Number of debug calls per measurement')
+    self.run()
+    calls = self.getArgument('calls')
+    log = self.framework.log
+    value = 12345
+    measurements = [('boilerplate, concatenated', lambda: self.debug('Value ' + str(value) + ' of ' + str(calls))),
+                    ('boilerplate, lazy',         lambda: self.debug('Value %s of %s', value, calls)),
+                    ('direct, concatenated',      lambda: log.debug('Value ' + str(value) + ' of ' + str(calls))),
+                    ('direct, lazy',              lambda: log.debug('Value %s of %s', value, calls)),
+                   ]
+    for name, call in measurements:
+      # Versions of the framework without lazy messages do not accept arguments
+      try:
+        call()
+        # Best of three, to reduce the influence of other processes
+        duration = min(timeit.repeat(call, number=calls, repeat=3))
+        self.print(name.ljust(26) + '  ' + ('%.0f' % (duration / calls * 1e9)).rjust(6) + ' ns/call')
+      except TypeError:
+        self.print(name.ljust(26) + '  not supported')
+      self.flush()
+
+app = app()
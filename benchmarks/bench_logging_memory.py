@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+#
+# Benchmark: Logging memory use
+# Adds a million log records that are written to a logfile and reports the resident memory
+# of the process along the way. Memory should stay flat once the buffers are in use.
+#
+# Usage:  $ python3 benchmarks/bench_logging_memory.py [--records 1000000] [--steps 10]
+#
+import sys, os
+import resource, tempfile, time
+
+# Load the framework from FRAMEWORK_PATH, or from the parent directory of this benchmark
+sys.path.insert(0, os.environ.get('FRAMEWORK_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from boilerplate_app import AppBoilerplate as Boilerplate
+
+# Records are written to a temporary logfile, not to the screen
+directory = tempfile.TemporaryDirectory()
+sys.argv += ['--logfile', os.path.join(directory.name, 'bench.log'), '--logfile-verbose', '4']
+
+class app(Boilerplate):
+  def __init__(self) -> None:
+    super().__init__()
+    self.getArgumentParser().add_argument('--records', type=int, default=1000000, help='Number of log records')
+    self.getArgumentParser().add_argument('--steps', type=int, default=10, help='Number of memory measurements')
+    self.run()
+    records = self.getArgument('records')
+    steps = max(1, self.getArgument('steps'))
+    self.report(0, time.perf_counter())
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+      for number in range(records * (step - 1) // steps, records * step // steps):
+        self.throw_notice('Record number ' + str(number))
+      self.report(records * step // steps, start)
+
+  def report(self, records, start):
+    self.print(str(records).rjust(9) + ' records  rss ' + str(self.getMemory() // 1024).rjust(6) + ' MiB  ' +
+               'peak ' + str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024).rjust(6) + ' MiB  ' +
+               '%.1f s' % (time.perf_counter() - start))
+    self.flush()
+
+  # Current resident memory in KiB, from /proc on Linux, else the peak
+  def getMemory(self):
+    try:
+      with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+      return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+app = app()
@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+#
+# Benchmark: readcsv column mapping
+# Measures rows per second of readcsv.read(header=True) on a wide and a narrow synthetic csv.
+#
+# Usage:  $ python3 benchmarks/bench_readcsv_columns.py [--wide-rows 2000] [--narrow-rows 200000]
+# To compare against another checkout of the framework, point FRAMEWORK_PATH to it:
+#         $ FRAMEWORK_PATH=/path/to/other/.framework python3 benchmarks/bench_readcsv_columns.py
+#
+import sys, os
+import tempfile, time
+from pathlib import Path
+
+# Load the framework from FRAMEWORK_PATH, or from the parent directory of this benchmark
+sys.path.insert(0, os.environ.get('FRAMEWORK_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from boilerplate_app import AppBoilerplate as Boilerplate
+
+class app(Boilerplate):
+  def __init__(self) -> None:
+    super().__init__()
+    self.getArgumentParser().add_argument('--wide-rows', type=int, default=2000, dest='wide_rows', help='Rows in the wide file')
+    self.getArgumentParser().add_argument('--wide-columns', type=int, default=300, dest='wide_columns', help='Columns in the wide file')
+    self.getArgumentParser().add_argument('--narrow-rows', type=int, default=200000, dest='narrow_rows', help='Rows in the narrow file')
+    self.getArgumentParser().add_argument('--repeat', type=int, default=3, help='Runs per file, the best run is reported')
+    self.run()
+    readcsv = self.module('readcsv')
+    with tempfile.TemporaryDirectory() as directory:
+      for name, rows, columns in (('wide', self.getArgument('wide_rows'), self.getArgument('wide_columns')),
+                                  ('narrow', self.getArgument('narrow_rows'), 5)):
+        file = self.createFile(Path(directory) / (name + '.csv'), rows, columns)
+        best = None
+        for run in range(self.getArgument('repeat')):
+          start = time.perf_counter()
+          readcsv.read(str(file), header=True)
+          duration = time.perf_counter() - start
+          best = duration if best is None or duration < best else best
+        self.print(name.ljust(7) + str(columns).rjust(4) + ' columns  ' + str(rows).rjust(7) + ' rows  ' +
+                   str(int(rows / best)).rjust(8) + ' rows/sec')
+        self.flush()
+
+  # Writes a csv with a header and rows of repeating values, so duplicate cell values occur
+  def createFile(self, file, rows, columns):
+    with open(file, 'w') as f:
+      f.write(','.join('column' + str(column) for column in range(columns)) + '\n')
+      for row in range(rows):
+        f.write(','.join(str((row + column) % 10) for column in range(columns)) + '\n')
+    return file
+
+app = app()
@@ -31,48 +31,52 @@ class CommonBoilerplate:
   ##  Logging
   #   Shortcut to functions in framework_logging
   #   Takes information into the content buffer. Uses flush() to send content to output sources.
+  #   Content can be passed lazily as callable or as %-style template with args, so content that
+  #   is not shown is never built. Example: self.debug('Row %s of %s', index, total)
+  #   Repeated messages can be rate limited, see Logging.setRateLimit(). Use key to group
+  #   messages that are not passed as template.
   #
   ### throw_error()
   #   @arguments     content [string|list]
   #   @description   Sends an error message to content buffer with display level 1.
   #                  Flushes the content buffer
   #                  Halts the application with this error message.
-  def throw_error(self, content):
+  def throw_error(self, content, *args):
     if hasattr(self.framework, 'log'):
-      return self.framework.log.throw_error(content)
+      return self.framework.log.throw_error(content, *args, module=type(self).__name__)
     else:
       print('[ ERROR ] ' + str(content))
       sys.exit()
   ### print()
   #   @arguments     content [string|list]
   #   @description   Sends a message to the content buffer with display level 2
-  def print(self, content=''):
+  def print(self, content='', *args):
     if hasattr(self.framework, 'log'):
-      return self.framework.log.print(content)
+      return self.framework.log.print(content, *args, module=type(self).__name__)
     else:
       print(str(content))
   ### throw_warning()
   #   @arguments     content [string|list]
   #   @description   Sends a message to the content buffer with display level 3
-  def throw_warning(self, content):
+  def throw_warning(self, content, *args, key=None):
     if hasattr(self.framework, 'log'):
-      return self.framework.log.throw_warning(content)
+      return self.framework.log.throw_warning(content, *args, module=type(self).__name__, key=key)
     else:
       print('[WARNING] ' + str(content))
   ### throw_notice()
   #   @arguments     content [string|list]
   #   @description   Sends a message to the content buffer with display level 4
-  def throw_notice(self, content):
+  def throw_notice(self, content, *args, key=None):
     if hasattr(self.framework, 'log'):
-      return self.framework.log.throw_notice(content)
+      return self.framework.log.throw_notice(content, *args, module=type(self).__name__, key=key)
     else:
       print('[NOTICE ] ' + str(content))
   ### debug()
   #   @arguments     content [string|list]
   #   @description   Sends a message to the content buffer with display level 5
-  def debug(self, content):
+  def debug(self, content, *args, key=None):
     if hasattr(self.framework, 'log'):
-      return self.framework.log.debug(content)
+      return self.framework.log.debug(content, *args, module=type(self).__name__, key=key)
     else:
       print('[ DEBUG ] ' + str(content))
   ### flush()
@@ -123,8 +127,30 @@ class CommonBoilerplate:
     return self.framework.files.getRecentFileIn(path=path, filter=filter, recursive=recursive, method=method)
   def getRecentFileInDirectory(self, path=None, filter=None, recursive=False, method='modified'):
     return self.framework.files.getRecentFileInDirectory(path=path, filter=filter, recursive=recursive, method=method)
-  def suggestFilename(self, suggestion=None, path=None, suffix=None, with_date=False, unique=False):
-    return self.framework.files.suggestFilename(suggestion=suggestion, path=path, suffix=suffix, with_date=with_date, unique=unique)
+  ### getRecentFiles()
+  #   @arguments     path [string|posixpath], filter [string], n [int], since [datetime|date|timedelta|timestamp],
+  #                  method [string], oldest [bool], recursive [bool]
+  #   @returns       list of posixpath objects
+  #   @description   Returns the n most recently modified or created files, or the n largest files
+  #                  with method size. Use since to skip older files, oldest to reverse the order.
+  def getRecentFiles(self, path=None, filter=None, n=None, since=None, method='modified', oldest=False, recursive=False):
+    return self.framework.files.getRecentFiles(path=path, filter=filter, n=n, since=since, method=method, oldest=oldest, recursive=recursive)
+  ### findFiles()
+  #   @arguments     path [string|posixpath], filter [string], recursive [bool], max_depth [int],
+  #                  prune [list of patterns], top [int], method [string]
+  #   @returns       list of posixpath objects
+  #   @description   Returns the files in path and its subdirectories, walked in parallel.
+  #                  Use prune to skip directories by name, top for only the most recent files.
+  def findFiles(self, path=None, filter=None, recursive=True, max_depth=None, prune=None, top=None, method='modified'):
+    return self.framework.files.findFiles(path=path, filter=filter, recursive=recursive, max_depth=max_depth, prune=prune, top=top, method=method)
+  ### suggestFilename()
+  #   @arguments     suggestion [string|posixpath], path [string|posixpath], suffix [string|list],
+  #                  with_date [bool], unique [bool], reserve [bool]
+  #   @returns       posixpath object
+  #   @description   Suggests a filename in path. Use unique to add a followup number when the file
+  #                  exists, reserve to also create the file so parallel workers get different names.
+  def suggestFilename(self, suggestion=None, path=None, suffix=None, with_date=False, unique=False, reserve=False):
+    return self.framework.files.suggestFilename(suggestion=suggestion, path=path, suffix=suffix, with_date=with_date, unique=unique, reserve=reserve)
   def getFiles(self):
     return self.framework.files
   ##  Date and time functions
@@ -151,6 +177,17 @@ class CommonBoilerplate:
   def getDateTime(self):
     return self.framework.date.getDateTime()
   
+  ##  Timing functions
+  #   Shortcut to functions in framework_timing
+  ### timed()
+  #   @arguments     name [string]
+  #   @returns       span, usable as context manager or decorator
+  #   @description   Measures wall and cpu time of a block or function as named span.
+  #                  A summary table per span is printed at exit.
+  #                  Example: with self.timed('read'): ...
+  def timed(self, name):
+    return self.framework.timing.timed(name)
+
   ##  Argument Functions
   ### getArgumentParser()
   #   @returns       Argparse instance
@@ -68,6 +68,9 @@ class Config(Boilerplate):
         return False
     if not value is None:
       self.arguments[key] = value
+    # Logging resolves colours once, so it needs to know when colouring changes
+    if key == 'coloured' and hasattr(self.framework, 'log'):
+      self.framework.log.prepareFormat(coloured=self.getArgument('coloured') == True)
     return True
 
   def getArgument(self, key):
@@ -138,6 +141,36 @@ class Config(Boilerplate):
                                       action='store_true',
                                       default=False,
                                       )
+    self.argument_parser.add_argument('--logfile-format',
+                                      help='Set logfile format: text (default) or jsonl for one json object per record.',
+                                      action='store',
+                                      choices=['text', 'jsonl'],
+                                      default=None,
+                                      )
+    self.argument_parser.add_argument('--logfile-rotate',
+                                      help='Rotate logfile by size (e.g. 100M) or daily. Rotated logfiles are compressed.',
+                                      action='store',
+                                      default=None,
+                                      )
+    self.argument_parser.add_argument('--logfile-retention',
+                                      help='Number of rotated logfiles to keep.',
+                                      action='store',
+                                      type=int,
+                                      default=None,
+                                      )
+    self.argument_parser.add_argument('--logfile-async',
+                                      help='Write logfile from a background thread.',
+                                      action='store_true',
+                                      default=False,
+                                      )
+    ##  Profiling
+    #   Use --profile <optional: filename> to profile the application with cProfile
+    self.argument_parser.add_argument('--profile',
+                                      help='Profile the application and write statistics to file.',
+                                      nargs='?',    # Allow 0 or more arguments
+                                      const=True,   # When no argument is supplied, use const
+                                      type=Path     # Ensure type or supplied argument is Path
+                                      )
     ##  Often-used arguments are available by default
     self.argument_parser.add_argument('--source', '-s', 
                                       help='Set source file or path',
@@ -21,6 +21,7 @@ from framework_config    import Config    as Config
 from framework_interact  import Interact  as Interact
 from framework_files     import Files     as Files
 from framework_date      import Date      as Date
+from framework_timing    import Timing    as Timing
 
 class Framework:
   def __init__(self) -> None:
@@ -34,6 +35,7 @@ class Framework:
     self.config   = Config(self)
     self.interact = Interact(self)
     self.date     = Date(self)
+    self.timing   = Timing(self)
 
     # Prepare configuration Containers
     # Module Path
@@ -43,7 +45,9 @@ class Framework:
   def run(self):
     # Initialisation
     self.config.parseArgumentParser()
+    self.log.displayInit()
     self.log.logFileInit()
+    self.timing.profileInit()
     self.log.debug(['Loaded .framework core with following modules: ', ', '.join(self.core_module_names)])
     
   ## Context management
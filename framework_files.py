@@ -5,6 +5,12 @@
 #
 import posixpath
 import sys, os
+import ctypes, stat, struct, time
+import heapq
+from collections import deque
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fnmatch import fnmatch
 from pathlib import Path, PosixPath
 
 # Ensure script is embedded and not called directly.
@@ -24,7 +30,10 @@ class Files(Boilerplate):
     super().__init__(framework)
     # Prepare reference containers
     # Prepare configurable values
+    self.directory_index_enabled = False  # Keep an in-memory index per directory, see setDirectoryIndex()
+    self.walk_workers            = 8      # Threads scanning directories in parallel in walk()
     # Prepare data containers
+    self.directory_indexes       = {}     # DirectoryIndex per directory path
     # Initialisation
 
   # GetPath
@@ -136,53 +145,194 @@ class Files(Boilerplate):
   def getRecentFileInDirectory(self, path=None, filter=None, recursive=False, method='modified'):
     # Normalize Path
     path = self.getPath(path)
-    # Normalize method
-    method = method[:1].lower() if len(method) > 0 else 'm'
-    # Normalize filter
-    # No filter
-    if filter == None or filter == False or len(filter) == 0:
-      filter = ''
-    # Everything filter
-    elif filter == '*' or filter == '*.*':
-      filter = '*'
-    # Extention without . supplied
-    elif filter[0:1] != '.':
-      filter = '.' + filter
-    filter = '*' + filter
-    # Allow for recursive searches
-    # I don't expect this to be used often, but since it is so little code to maintain,
-    # it's easy to keep.
-    if recursive == True:
-      filter = '**/' + filter
-    # Find the most recent file with filter in directory
-    if method == 'c':
-      try:
-        files = list(path.glob(filter))
-        for file in files:
-          if not file.is_file():
-            files.remove(file)
-        return max(
-          files,
-          key=os.path.getctime # Use getctime for recentlt created, getmtime for recently modified
-        )
-      except ValueError:
-        return None
+    # Normalize filter and method
+    filter = self.getSuffixFilter(filter)
+    attribute = self.getTimeAttribute(method)
+    # Use the in-memory directory index if it is enabled
+    if self.directory_index_enabled and recursive != True:
+      return self.getDirectoryIndex(path).getRecentFile(filter=filter, attribute=attribute)
+    # Keep only the most recent file found so far. The walker stats the files in its threads,
+    # so entry.stat() returns the cached result.
+    result = None
+    result_time = None
+    for entry in self.walk(path, filter=filter, max_depth=None if recursive == True else 0, with_stat=True):
+      entry_time = getattr(entry.stat(), attribute)
+      if result_time is None or entry_time > result_time:
+        result = entry.path
+        result_time = entry_time
+    return Path(result) if result is not None else None
+
+  ### walk()
+  #   @arguments     path, filter [suffix], max_depth [int|None], prune [list of patterns],
+  #                  with_stat [bool], workers [int|None]
+  #   @returns       generator of os.DirEntry objects for the matching files
+  #   @description   Walks a directory tree with a pool of threads, each scanning one directory
+  #                  with os.scandir. Entries are yielded as soon as their directory is scanned,
+  #                  in no particular order. max_depth 0 only scans path itself. Directories whose
+  #                  name matches one of the prune patterns (fnmatch) are skipped. With with_stat=True
+  #                  the files are stat-ed in the threads, so entry.stat() does not block.
+  #                  Symbolic links to directories are not followed; unreadable directories are skipped.
+  def walk(self, path=None, filter=None, max_depth=None, prune=None, with_stat=False, workers=None):
+    path = str(self.getPath(path))
+    filter = self.getSuffixFilter(filter)
+    if type(prune) == str:
+      prune = [prune]
+    # A single directory is scanned directly
+    if max_depth == 0:
+      yield from self.iterDirectory(path, filter, prune, False, with_stat, [])
+      return
+    workers = workers if workers is not None else self.walk_workers
+    # Keep a bounded number of scans in flight, the remaining directories wait in a queue
+    directories = deque([(path, 0)])
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='FilesWalk')
+    try:
+      while len(directories) > 0 or len(pending) > 0:
+        while len(directories) > 0 and len(pending) < workers * 2:
+          directory, depth = directories.popleft()
+          descend = max_depth is None or depth < max_depth
+          pending[executor.submit(self.scanDirectory, directory, filter, prune, descend, with_stat)] = depth
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+          depth = pending.pop(future)
+          files, subdirectories = future.result()
+          directories.extend((subdirectory, depth + 1) for subdirectory in subdirectories)
+          yield from files
+    finally:
+      # Also reached when the caller stops iterating early
+      executor.shutdown(wait=True, cancel_futures=True)
+
+  ### findFiles()
+  #   @arguments     see walk(), top [int|None], method ['modified'|'created'|'size']
+  #   @returns       list of Path objects
+  #   @description   Returns the matching files in a directory tree. With top, only the top most
+  #                  recent (or largest) files are returned, see getRecentFiles().
+  def findFiles(self, path=None, filter=None, recursive=True, max_depth=None, prune=None, top=None, method='modified', workers=None):
+    if top is not None:
+      return self.getRecentFiles(path, filter=filter, n=top, method=method, recursive=recursive, max_depth=max_depth, prune=prune, workers=workers)
+    max_depth = max_depth if recursive == True else 0
+    return [Path(entry.path) for entry in self.walk(path, filter=filter, max_depth=max_depth, prune=prune, workers=workers)]
+
+  ### getRecentFiles()
+  #   @arguments     path, filter [suffix], n [int|None], since [datetime|date|timedelta|timestamp],
+  #                  method ['modified'|'created'|'size'], oldest [bool], recursive [bool]
+  #   @returns       list of Path objects
+  #   @description   Returns the n most recently modified or created files, or the n largest files,
+  #                  best first. With oldest=True the n oldest or smallest files are returned instead.
+  #                  Only the n best files are kept while scanning, n None returns all files sorted.
+  #                  since skips files modified (or created for method 'created') before it; a
+  #                  timedelta is taken relative to now.
+  def getRecentFiles(self, path=None, filter=None, n=None, since=None, method='modified', oldest=False,
+                           recursive=False, max_depth=None, prune=None, workers=None):
+    attribute = self.getSortAttribute(method)
+    max_depth = max_depth if recursive == True else 0
+    entries = self.walk(path, filter=filter, max_depth=max_depth, prune=prune, with_stat=True, workers=workers)
+    # Filter on time while streaming
+    if since is not None:
+      since = self.getTimestamp(since)
+      since_attribute = 'st_ctime' if attribute == 'st_ctime' else 'st_mtime'
+      entries = (entry for entry in entries if getattr(entry.stat(), since_attribute) >= since)
+    key = lambda entry: getattr(entry.stat(), attribute)
+    if n is None:
+      entries = sorted(entries, key=key, reverse=not oldest)
+    elif oldest:
+      entries = heapq.nsmallest(n, entries, key=key)
     else:
-      try:
-        files = list(path.glob(filter))
-        for file in files:
-          if not file.is_file():
-            files.remove(file)
-        return max(
-          files,
-          key=os.path.getmtime # Use getctime for recentlt created, getmtime for recently modified
-        )
-      except ValueError:
-        return None
+      entries = heapq.nlargest(n, entries, key=key)
+    return [Path(entry.path) for entry in entries]
+
+  # Scans a single directory for walk()
+  # Returns the matching file entries and the subdirectories to descend into
+  @staticmethod
+  def scanDirectory(directory, filter, prune, descend, with_stat):
+    subdirectories = []
+    files = list(Files.iterDirectory(directory, filter, prune, descend, with_stat, subdirectories))
+    return files, subdirectories
+
+  # Yields the matching file entries in a single directory
+  # Subdirectories to descend into are appended to the subdirectories list
+  @staticmethod
+  def iterDirectory(directory, filter, prune, descend, with_stat, subdirectories):
+    try:
+      entries = os.scandir(directory)
+    except OSError:
+      return
+    with entries:
+      for entry in entries:
+        try:
+          if entry.is_file():
+            if entry.name.endswith(filter):
+              if with_stat:
+                entry.stat()
+              yield entry
+          elif descend and entry.is_dir(follow_symlinks=False):
+            if prune is None or not any(fnmatch(entry.name, pattern) for pattern in prune):
+              subdirectories.append(entry.path)
+        except OSError:
+          # The entry was removed while scanning the directory
+          pass
+
+  # Normalizes a filter to a suffix; no filter or an everything filter matches all files
+  def getSuffixFilter(self, filter=None):
+    if filter is None or filter is False or len(filter) == 0 or filter == '*' or filter == '*.*':
+      return ''
+    # Extention without . supplied
+    if filter[0:1] != '.':
+      return '.' + filter
+    return filter
+
+  # Use st_ctime for recently created, st_mtime for recently modified
+  def getTimeAttribute(self, method='modified'):
+    method = method[:1].lower() if len(method) > 0 else 'm'
+    return 'st_ctime' if method == 'c' else 'st_mtime'
+
+  # As getTimeAttribute(), with st_size for the largest files
+  def getSortAttribute(self, method='modified'):
+    if method[:1].lower() == 's':
+      return 'st_size'
+    return self.getTimeAttribute(method)
+
+  # Converts a datetime, date or timedelta (before now) to a timestamp, numbers are returned as is
+  def getTimestamp(self, moment):
+    if isinstance(moment, timedelta):
+      return (datetime.now() - moment).timestamp()
+    if isinstance(moment, datetime):
+      return moment.timestamp()
+    if isinstance(moment, date):
+      return datetime.combine(moment, datetime.min.time()).timestamp()
+    return float(moment)
+
+  ### setDirectoryIndex()
+  #   @arguments     enabled [bool]
+  #   @description   Keeps an in-memory index of files, sizes and times per directory, so repeated
+  #                  getRecentFileIn() calls on the same directory do not rescan it.
+  #                  On Linux the index is updated through inotify. Elsewhere it is refreshed when
+  #                  the modification time of the directory changes; this notices files that are
+  #                  added, removed or renamed, but not changes to the contents of existing files.
+  def setDirectoryIndex(self, enabled=True):
+    self.directory_index_enabled = enabled is True
+    if not self.directory_index_enabled:
+      for index in self.directory_indexes.values():
+        index.close()
+      self.directory_indexes = {}
+
+  def getDirectoryIndex(self, path):
+    path = str(self.getPath(path))
+    if path not in self.directory_indexes:
+      watcher = None
+      if sys.platform.startswith('linux'):
+        try:
+          watcher = DirectoryWatcher(path)
+        except (OSError, AttributeError):
+          self.debug('Files.getDirectoryIndex: inotify is not available, using directory modification time.')
+      self.directory_indexes[path] = DirectoryIndex(path, watcher=watcher)
+      self.debug('Files.getDirectoryIndex: Indexed ' + str(len(self.directory_indexes[path].entries)) + ' files in ' + path + '.')
+    return self.directory_indexes[path]
 
   # Takes a path and a filename
-  # 
-  def suggestFilename(self, suggestion=None, path=None, suffix=None, with_date=False, unique=False):
+  # With unique, a followup number is added if the file already exists
+  # With reserve, the file is also created atomically, so parallel workers never get the same name
+  def suggestFilename(self, suggestion=None, path=None, suffix=None, with_date=False, unique=False, reserve=False):
     # Make sure path is posixpath
     if path is None or path is False or len(str(path).strip()) == 0:
       path = self.getPath()
@@ -222,17 +372,208 @@ class Files(Boilerplate):
       suggestion = suggestion.with_name(self.getDate() + '-' + suggestion.name)
     #
     # Check if filename should be unique
-    if unique is True:
-      try_file = path / suggestion
-      if try_file.is_file():
-        self.debug(['File.suggestFilename: Suggested file \'' + suggestion.name + '\' already exists but should be unique.',
-                    ' '*22 + 'Looking for a free followup number for the file.'])
-        # See if we can find a file that does not yet exist
-        number = 1
-        while try_file.with_name(suggestion.stem + '-' + str(number)).with_suffix(''.join(suggestion.suffixes)).is_file():
-          number += 1
-        suggestion = suggestion.with_name(suggestion.stem + '-' + str(number)).with_suffix(''.join(suggestion.suffixes))
+    if unique is True or reserve is True:
+      return self.getUniqueFilename((path / suggestion).parent, suggestion.name, reserve=reserve)
     # Build suggestion path
     suggestion = path / suggestion
     return suggestion
-    
\ No newline at end of file
+
+  ### getUniqueFilename()
+  #   @arguments     path [directory], name [filename], reserve [bool]
+  #   @returns       Path of name in path, or of name with a followup number (name-N.suffix)
+  #   @description   Finds a free followup number with exponential and binary probing, which
+  #                  takes O(log n) stat calls for n numbered files, assuming numbers are not
+  #                  skipped. With reserve, the file is created with O_CREAT|O_EXCL; if another
+  #                  process takes the same name first, the next number is tried.
+  def getUniqueFilename(self, path, name, reserve=False):
+    suffixes = ''.join(Path(name).suffixes)
+    stem = name[:len(name) - len(suffixes)]
+    candidate = lambda number: path / (name if number == 0 else stem + '-' + str(number) + suffixes)
+    number = 0
+    while True:
+      if candidate(number).is_file():
+        if number == 0:
+          self.debug(['File.suggestFilename: Suggested file \'' + name + '\' already exists but should be unique.',
+                      ' '*22 + 'Looking for a free followup number for the file.'])
+        # Double the number until a free one is found, then search the boundary in between
+        low = number
+        high = max(1, number * 2)
+        while candidate(high).is_file():
+          low = high
+          high = high * 2
+        while high - low > 1:
+          middle = (low + high) // 2
+          if candidate(middle).is_file():
+            low = middle
+          else:
+            high = middle
+        number = high
+      if reserve is not True:
+        return candidate(number)
+      try:
+        os.close(os.open(candidate(number), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        return candidate(number)
+      except FileExistsError:
+        # Taken in the meantime, continue after it
+        number += 1
+
+
+##  Directory index
+#   Holds the stat results of the files in a directory and the most recent file per filter.
+#   refresh() brings the index up to date: through the watcher when available, else by
+#   comparing the modification time of the directory.
+class DirectoryIndex:
+  def __init__(self, path, watcher=None) -> None:
+    # Prepare reference containers
+    self.path            = path
+    self.watcher         = watcher
+    self.watched         = watcher is not None  # Watch the directory again when it is recreated
+    # Prepare configurable values
+    self.racy_interval   = 2 * 10 ** 9  # Directory changes within this many nanoseconds may share one mtime
+    # Prepare data containers
+    self.entries         = {}    # File name: stat result
+    self.directory_mtime = None
+    self.recent          = {}    # (filter, attribute): most recent file path, cleared on change
+    # Initialisation
+    self.scan()
+
+  def scan(self):
+    # Files that are already indexed keep their stat result, only new files are stat-ed
+    entries = {}
+    try:
+      directory_mtime = os.stat(self.path).st_mtime_ns
+      with os.scandir(self.path) as directory:
+        for entry in directory:
+          try:
+            if entry.is_file():
+              entries[entry.name] = self.entries[entry.name] if entry.name in self.entries else entry.stat()
+          except OSError:
+            pass
+    except OSError:
+      # The directory was removed, it is indexed as empty until it is created again
+      directory_mtime = None
+    self.entries = entries
+    self.directory_mtime = directory_mtime
+    self.recent = {}
+
+  def update(self, names):
+    # Stat only the files that changed
+    for name in names:
+      try:
+        result = os.stat(os.path.join(self.path, name))
+        if stat.S_ISREG(result.st_mode):
+          self.entries[name] = result
+        else:
+          self.entries.pop(name, None)
+      except OSError:
+        self.entries.pop(name, None)
+    self.recent = {}
+
+  def refresh(self):
+    if self.watcher is not None:
+      names = self.watcher.getChanges()
+      # None means the watcher lost track of changes, or its watch was removed with the directory.
+      # Watch the directory again and scan it, or fall back to the directory modification time
+      # while the directory does not exist.
+      if names is None:
+        self.watcher.close()
+        try:
+          self.watcher = DirectoryWatcher(self.path)
+        except OSError:
+          self.watcher = None
+        self.entries = {}
+        self.scan()
+      elif len(names) > 0:
+        self.update(names)
+      return
+    try:
+      directory_mtime = os.stat(self.path).st_mtime_ns
+    except OSError:
+      directory_mtime = None
+    # A removed directory that exists again is watched again
+    if self.watched and directory_mtime is not None:
+      try:
+        self.watcher = DirectoryWatcher(self.path)
+        self.scan()
+        return
+      except OSError:
+        self.watcher = None
+    # A change right after the last scan can have the same mtime, so recent mtimes are not trusted
+    if directory_mtime is None or directory_mtime != self.directory_mtime or time.time_ns() - directory_mtime < self.racy_interval:
+      self.scan()
+
+  def getRecentFile(self, filter='', attribute='st_mtime'):
+    self.refresh()
+    key = (filter, attribute)
+    if key not in self.recent:
+      result = None
+      result_time = None
+      for name, result_stat in self.entries.items():
+        if name.endswith(filter):
+          entry_time = getattr(result_stat, attribute)
+          if result_time is None or entry_time > result_time:
+            result = name
+            result_time = entry_time
+      self.recent[key] = Path(self.path) / result if result is not None else None
+    return self.recent[key]
+
+  def close(self):
+    self.watched = False
+    if self.watcher is not None:
+      self.watcher.close()
+      self.watcher = None
+
+
+##  Directory watcher
+#   Uses Linux inotify through ctypes to collect the names of files in a directory that were
+#   created, changed, moved or removed since the last call to getChanges().
+class DirectoryWatcher:
+  IN_MODIFY      = 0x00000002
+  IN_ATTRIB      = 0x00000004
+  IN_CLOSE_WRITE = 0x00000008
+  IN_MOVED_FROM  = 0x00000040
+  IN_MOVED_TO    = 0x00000080
+  IN_CREATE      = 0x00000100
+  IN_DELETE      = 0x00000200
+  IN_DELETE_SELF = 0x00000400
+  IN_MOVE_SELF   = 0x00000800
+  IN_Q_OVERFLOW  = 0x00004000
+  IN_IGNORED     = 0x00008000
+  IN_NONBLOCK    = 0o4000
+  IN_CLOEXEC     = 0o2000000
+  EVENT          = struct.Struct('iIII')
+
+  def __init__(self, path) -> None:
+    libc = ctypes.CDLL(None, use_errno=True)
+    self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    mask = self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | \
+           self.IN_CREATE | self.IN_DELETE | self.IN_DELETE_SELF | self.IN_MOVE_SELF
+    if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+      errno = ctypes.get_errno()
+      os.close(self.fd)
+      raise OSError(errno, 'inotify_add_watch failed for ' + path)
+
+  ### getChanges()
+  #   @returns       set of changed file names, or None when changes may have been missed
+  def getChanges(self):
+    names = set()
+    while True:
+      try:
+        data = os.read(self.fd, 65536)
+      except BlockingIOError:
+        break
+      offset = 0
+      while offset < len(data):
+        wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+        offset += self.EVENT.size
+        if mask & (self.IN_Q_OVERFLOW | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+          return None
+        if length > 0:
+          names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+        offset += length
+    return names
+
+  def close(self):
+    os.close(self.fd)
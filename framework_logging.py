@@ -4,7 +4,10 @@
 # Adds bufferd output handling and filtering
 #
 import sys, os
-from datetime import datetime
+import atexit, gzip, json, queue, shutil, threading, time
+import multiprocessing
+from collections import deque
+from datetime import datetime, date
 #import logging # https://docs.python.org/3/library/logging.html
 
 # Ensure script is embedded and not called directly.
@@ -25,29 +28,202 @@ class Logging(Boilerplate):
     # Prepare reference containers
     self.logfile_target           = None
     self.logfile_suffix           = '.log'
+    self.logfile_format           = 'text' # Supports text for readable lines and jsonl for one json object per record
     self.logfile_write_mode       = 'w'    # Supports a for append en w for (over)write
     self.logfile                  = None   # Reference to file in open
+    self.logfile_queue            = None   # Queue feeding the background logfile writer, if enabled
+    self.logfile_writer           = None   # Background logfile writer thread, if enabled
+    self.logfile_compressors      = []     # Threads compressing rotated logfiles
+    self.display_flusher          = None   # Thread flushing buffered records after max_display_latency
+    self.display_pending          = threading.Event()  # Set when a record is added to an empty buffer
+    self.flush_lock               = threading.RLock()  # Flushes can come from the flusher thread as well
+    self.process_queue            = None   # Queue carrying records from forked worker processes to this process
+    self.process_listener         = None   # Thread adding records from forked worker processes to the buffer
+    self.process_child            = False  # True in a forked worker process, records are sent to the parent
     # Prepare configurable values
     self.min_log_level            = 2
     self.min_logfile_level        = 0
-    self.max_display_buffer_size  = 16
+    self.max_display_buffer_size  = 256    # Flush when this number of records is buffered
+    self.max_display_buffer_bytes = 65536  # Flush when the buffered content reaches this number of characters
+    self.max_display_latency      = 0.5    # Flush buffered records after at most this number of seconds
+    self.max_buffer_size          = 4096   # Hard limit, the buffer is always flushed at this size
+    self.min_emit_level           = 5      # Records above this level are discarded in add()
+    self.emit_level_gate          = False  # The gate is enabled when display and logfile levels are known
+    self.logfile_batch_size       = 1024   # Maximum number of records per write by the background writer
+    self.logfile_flush_interval   = 1.0    # Maximum number of seconds before written records reach disk
+    self.logfile_rotate_size      = None   # Rotate logfile when it grows beyond this number of bytes
+    self.logfile_rotate_daily     = False  # Rotate logfile when the date changes
+    self.logfile_retention        = 7      # Number of rotated logfiles to keep
+    self.rate_limit               = None   # Show the first [rate_limit] records with the same key, None to disable
+    self.rate_sample              = 0      # After the rate limit, show every [rate_sample]th record, 0 for none
+    self.max_rate_keys            = 10000  # Forget counted keys beyond this number of different keys
     # Prepare data containers
-    self.buffer                   = []     # For pushing to screen
-    self.file_buffer              = []     # For pushing to file
+    self.buffer_bytes             = 0      # Size of the buffered content in characters
+    self.rate_counts              = {}     # Per key: [records counted, records suppressed since last flush, level]
+    self.logfile_size             = 0      # Size of the open logfile, used for rotation
+    self.logfile_date             = None   # Date the open logfile was opened, used for rotation
+    self.jsonl_fields             = {}     # Pre-encoded constant json fields per level, see setLogFileFormat()
+    self.textual_levels           = {}     # Resolved level names per level, see prepareFormat()
+    self.display_prefixes         = {}     # Prefix for the first and following display lines per level
+    self.buffer                   = deque()  # Records waiting to be pushed to screen and file
+                                             # Appending and popping are thread-safe without locking
     # Development and debugging
+    # Initialisation
+    self.prepareFormat()
+    # Drain buffer and logfile writer when the application exits
+    atexit.register(self.close)
+    # Hand the output over to this process when worker processes are forked
+    os.register_at_fork(before=self.beforeFork, after_in_parent=self.afterForkInParent, after_in_child=self.afterForkInChild)
 
-  def __del__(self):
-    if self.logfile is not None: 
-      # Try to flush buffer
-      try:
-        self.flush()
-      except:
-        pass
-      # Try to close the write connection to the logfile
+  ### Close
+  #   @description flushes the buffer, drains the background logfile writer and closes the logfile.
+  #                Runs automatically when the application exits.
+  def close(self):
+    # A forked worker process does not own the output
+    if self.process_child:
+      return
+    # Collect the records that worker processes sent
+    if self.process_listener is not None:
+      self.process_queue.put(None)
+      self.process_listener.join()
+      self.process_listener = None
+    # Try to flush buffer
+    try:
+      self.flush()
+    except:
+      pass
+    # Wait for the background writer to write all queued records
+    if self.logfile_writer is not None:
+      self.logfile_queue.put(None)
+      self.logfile_writer.join()
+      self.logfile_writer = None
+    # Wait for rotated logfiles to be compressed
+    for compressor in self.logfile_compressors:
+      compressor.join()
+    # Try to close the write connection to the logfile
+    if self.logfile is not None:
       try:
         self.logfile.close()
       except:
         pass
+      self.logfile = None
+
+  ##  Multiprocessing
+  #   Forked worker processes do not write to display or logfile themselves, since they would
+  #   interleave output and reopen the logfile. Records added in a worker process are sent to
+  #   the parent process over a queue, where a listener thread adds them to the buffer.
+  def beforeFork(self):
+    # No flush may be running during the fork
+    self.flush_lock.acquire()
+    # Make sure the queue and listener exist before the worker process is created
+    if self.process_queue is None:
+      self.process_queue = multiprocessing.Queue()
+      self.process_listener = threading.Thread(target=self.runProcessListener, name='ProcessListener', daemon=True)
+      self.process_listener.start()
+    # Write out everything that is buffered, so the worker process does not inherit it
+    self.flush()
+    if self.logfile_writer is not None:
+      self.logfile_queue.join()
+    if self.logfile is not None:
+      self.logfile.flush()
+
+  def afterForkInParent(self):
+    self.flush_lock.release()
+
+  def afterForkInChild(self):
+    self.flush_lock.release()
+    # Threads are not copied into the worker process, and the output is owned by the parent
+    self.process_child       = True
+    self.process_listener    = None
+    self.display_flusher     = None
+    self.logfile_writer      = None
+    self.logfile_compressors = []
+    self.logfile             = None
+    self.buffer.clear()
+
+  def runProcessListener(self):
+    while True:
+      record = self.process_queue.get()
+      # None is queued by close() to stop the listener
+      if record is None:
+        break
+      self.addRecord(record)
+
+  # Display initialisation
+  def displayInit(self):
+    # Use configured buffer limits if supplied
+    if type(self.getArgument('display_buffer_size')) is int:
+      self.max_display_buffer_size = max(0, self.getArgument('display_buffer_size'))
+    # Never buffer more records than the hard limit
+    self.max_display_buffer_size = min(self.max_display_buffer_size, self.max_buffer_size - 1)
+    if type(self.getArgument('display_buffer_bytes')) is int:
+      self.max_display_buffer_bytes = max(0, self.getArgument('display_buffer_bytes'))
+    if type(self.getArgument('display_buffer_latency')) in [int, float]:
+      self.max_display_latency = self.getArgument('display_buffer_latency')
+    # Use configured rate limiting of repeated messages if supplied
+    if type(self.getArgument('log_rate_limit')) is int:
+      self.setRateLimit(limit=self.getArgument('log_rate_limit'), sample=self.getArgument('log_rate_sample'))
+    # Start the flusher, so records do not wait in the buffer longer than max_display_latency
+    if self.max_display_latency > 0 and self.display_flusher is None:
+      self.display_flusher = threading.Thread(target=self.runDisplayFlusher, name='DisplayFlusher', daemon=True)
+      self.display_flusher.start()
+
+  ### Set rate limit
+  #   @description limits repeated warnings, notices and debug messages. Of the records with the
+  #                same key, the first [limit] are kept, after that only every [sample]th.
+  #                The key is the message template, or the key argument if supplied.
+  #                At flush, a summary reports how many similar messages were suppressed.
+  def setRateLimit(self, limit=None, sample=0):
+    self.rate_limit = limit if type(limit) is int and limit >= 0 else None
+    self.rate_sample = sample if type(sample) is int and sample > 0 else 0
+    self.rate_counts = {}
+
+  def isRateLimited(self, key, level):
+    counter = self.rate_counts.get(key)
+    if counter is None:
+      # Keep memory bounded when messages are not templated
+      if len(self.rate_counts) >= self.max_rate_keys:
+        self.evictRateKeys()
+      counter = self.rate_counts[key] = [0, 0, level]
+    counter[0] += 1
+    if counter[0] <= self.rate_limit or \
+       (self.rate_sample > 0 and (counter[0] - self.rate_limit) % self.rate_sample == 0):
+      return False
+    counter[1] += 1
+    return True
+
+  ### Evict rate keys
+  #   @description forgets counted keys when there are max_rate_keys of them. Keys that never
+  #                reached the limit go first, which are mostly one-off concatenated messages.
+  #                If that frees less than half, keys without suppressed records go as well.
+  #                Keys with suppressed records are kept until their summary is added at flush.
+  def evictRateKeys(self):
+    # Iterate over a copy and replace the dict, since other threads may add keys meanwhile
+    counts = list(self.rate_counts.items())
+    kept = { key: counter for key, counter in counts if counter[0] > self.rate_limit }
+    if len(kept) >= self.max_rate_keys // 2:
+      kept = { key: counter for key, counter in counts if counter[1] > 0 }
+    self.rate_counts = kept
+
+  def addRateLimitSummary(self):
+    for key, counter in list(self.rate_counts.items()):
+      if counter[1] > 0:
+        message = key if len(key) <= 80 else key[:77] + '...'
+        self.buffer.append({ 'content': ['Suppressed ' + str(counter[1]) + ' similar messages: ' + message],
+                             'level': counter[2],
+                             'datetime': datetime.now(),
+                             'module': None,
+                           })
+        counter[1] = 0
+
+  def runDisplayFlusher(self):
+    while True:
+      # Wait until a record is added to an empty buffer, then give it max_display_latency to fill
+      self.display_pending.wait()
+      time.sleep(self.max_display_latency)
+      self.display_pending.clear()
+      if len(self.buffer) > 0:
+        self.flush()
 
   # Log file initialisation
   def logFileInit(self):
@@ -61,7 +237,32 @@ class Logging(Boilerplate):
       # Set logfile write mode
       if self.getArgument('logfile_append') is True:
         self.setLogFileWriteMode('append')
+      # Set logfile format
+      if self.getArgument('logfile_format') is not None:
+        self.setLogFileFormat(self.getArgument('logfile_format'))
+      # Set logfile rotation
+      if self.getArgument('logfile_rotate') is not None:
+        self.setLogFileRotation(rotate=self.getArgument('logfile_rotate'), retention=self.getArgument('logfile_retention'))
+      # Write logfile from a background thread
+      if self.getArgument('logfile_async') is True:
+        self.startLogFileWriter()
     # If argument is not set, no action is to be taken
+    # Display and logfile levels are now known, so records that no output will show can be
+    # discarded as soon as they are added.
+    self.emit_level_gate = True
+    self.setEmitLevel()
+
+  ### Set emit level
+  #   @description stores the highest level that is shown on display or written to logfile,
+  #                so add() can discard other records before doing any work.
+  def setEmitLevel(self):
+    if not self.emit_level_gate:
+      return
+    level = self.min_log_level
+    if self.logfile_target is not None:
+      # Logfile level 0 still writes level 2 content to file
+      level = max(level, self.min_logfile_level, 2)
+    self.min_emit_level = level
 
   #   Log file functions
   def setLogFileTarget(self, target):
@@ -74,6 +275,7 @@ class Logging(Boilerplate):
     # Use suffix if supplied, else add locally configured default
     # Store target in local storage
     self.logfile_target = target if len(target.suffixes) > 0 else target.with_suffix(self.logfile_suffix)
+    self.setEmitLevel()
     # Log intended file usage.
     self.throw_notice('Log to file: Logging to: \'' + str(self.logfile_target.name) + '\'.')
 
@@ -88,32 +290,216 @@ class Logging(Boilerplate):
     if not level == self.min_logfile_level:
       self.debug('Changed logfile display level from \'' + str(self.min_logfile_level) + '\' to \'' + str(level) + '\'.')
       self.min_logfile_level = level
+      self.setEmitLevel()
     
   def setLogFileWriteMode(self, mode='w'):
     # Supports 'a' or 'append' as mode to set append mode
     # Defaults to 'w' (over)write mode
     self.logfile_write_mode = 'a' if mode[:1] == 'a' else 'w'
-  
+
+  ### Set logfile format
+  #   @description 'text' writes readable lines, 'jsonl' writes one json object per record with
+  #                time, level, levelname, app, module and message (list of lines).
+  def setLogFileFormat(self, format='text'):
+    format = str(format).strip().lower()
+    if format not in ['text', 'jsonl']:
+      self.throw_warning('Log to file: Format \'' + format + '\' is not supported. Use \'text\' or \'jsonl\'.')
+      return False
+    self.logfile_format = format
+    # Encode the fields that do not change between records only once
+    app = json.dumps(self.framework.getAppName())
+    names = { 1: 'error', 2: 'print', 3: 'warning', 4: 'notice', 5: 'debug' }
+    self.jsonl_fields = { level: '","level":' + str(level) + ',"levelname":"' + name + '","app":' + app + ',"module":'
+                          for level, name in names.items() }
+    return True
+
+  ### Set logfile rotation
+  #   @description rotates the logfile by size ('100M', '1G', '500K' or a number of bytes) or
+  #                by day ('daily'). Rotated logfiles are gzip-compressed in a background thread,
+  #                only the most recent [retention] rotated logfiles are kept.
+  def setLogFileRotation(self, rotate=None, retention=None):
+    rotate = str(rotate).strip().lower()
+    if rotate in ['daily', 'day', 'd']:
+      self.logfile_rotate_daily = True
+    else:
+      multiplier = { 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3 }
+      try:
+        if rotate[-1:] in multiplier:
+          self.logfile_rotate_size = int(float(rotate[:-1]) * multiplier[rotate[-1:]])
+        else:
+          self.logfile_rotate_size = int(rotate)
+      except ValueError:
+        self.throw_warning('Log to file: Rotation \'' + rotate + '\' is not supported. Use \'daily\' or a size such as \'100M\'.')
+        return False
+    if type(retention) is int and retention >= 0:
+      self.logfile_retention = retention
+    self.debug('Log to file: Rotating logfile ' + ('daily' if self.logfile_rotate_daily else 'at ' + str(self.logfile_rotate_size) + ' bytes') +
+               ', keeping ' + str(self.logfile_retention) + ' rotated logfiles.')
+    return True
+
+  ### Write logfile rows
+  #   @description writes records, each a list of rows, to the logfile. Rotation is checked
+  #                before every record, so a record is never split over two logfiles and a
+  #                batch from the background writer does not grow a logfile past its size.
+  #                Records between rotations are still written with a single call.
+  def writeLogFileRows(self, records):
+    if self.logfile is not None and self.logfile_rotate_daily and self.logfile_date != date.today():
+      self.rotateLogFile()
+    pending = []
+    for rows in records:
+      if self.logfile is not None and self.logfile_rotate_size is not None and self.logfile_size >= self.logfile_rotate_size:
+        self.logfile.writelines(pending)
+        pending = []
+        self.rotateLogFile()
+      # Open the logfile, so its size includes the run information lines
+      self.getLogFile()
+      pending.extend(rows)
+      self.logfile_size += sum(len(row) for row in rows)
+    self.getLogFile().writelines(pending)
+
+  def rotateLogFile(self):
+    self.logfile.close()
+    self.logfile = None
+    # Move the logfile aside. Renaming is fast, compressing is left to a background thread.
+    rotated = self.logfile_target.with_name(self.logfile_target.name + '.' + datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+    os.replace(self.logfile_target, rotated)
+    self.logfile_compressors = [compressor for compressor in self.logfile_compressors if compressor.is_alive()]
+    compressor = threading.Thread(target=self.compressLogFile, args=(rotated,), name='LogFileCompressor')
+    compressor.start()
+    self.logfile_compressors.append(compressor)
+
+  def compressLogFile(self, file):
+    with open(file, 'rb') as source, gzip.open(str(file) + '.gz', 'wb') as target:
+      shutil.copyfileobj(source, target)
+    os.remove(file)
+    # Remove the oldest rotated logfiles beyond retention. The timestamp in the name sorts by age.
+    rotated = sorted(self.logfile_target.parent.glob(self.logfile_target.name + '.*.gz'))
+    for file in rotated[:max(0, len(rotated) - self.logfile_retention)]:
+      # Another compressor thread may have removed the same file
+      try:
+        os.remove(file)
+      except FileNotFoundError:
+        pass
+
   def sendLineToLogFile(self, line):
-    if self.logfile_target is not None:
+    if self.logfile_target is not None and self.logfile_format == 'jsonl':
+      rows = ['{"time":"' + line['datetime'].isoformat(sep=' ', timespec='milliseconds') + self.jsonl_fields[line['level']] +
+              json.dumps(line['module']) + ',"message":' + json.dumps(line['content'], ensure_ascii=False, separators=(',', ':')) + "}\n"]
+      if self.logfile_writer is not None:
+        self.logfile_queue.put(rows)
+      else:
+        self.writeLogFileRows([rows])
+    elif self.logfile_target is not None:
       pre = str(line['datetime'])[:-4] + ' (' + self.getTextualLevel(line['level']) + '): '
+      rows = []
       for row in line['content']:
         if line['level'] == 2:
           pre = ''
-        self.getLogFile().write(pre + row + "\n")
+        rows.append(pre + row + "\n")
         pre = ' '*len(pre)
+      # Hand the formatted rows to the background writer if it is running
+      if self.logfile_writer is not None:
+        self.logfile_queue.put(rows)
+      else:
+        self.writeLogFileRows([rows])
+
+  ### Background logfile writer
+  #   @description starts a thread that writes queued records to the logfile in batches, so slow
+  #                disks do not stall the thread that flushes the log buffer.
+  def startLogFileWriter(self):
+    if self.logfile_writer is not None:
+      return
+    # Use configured batch size and flush interval if supplied
+    if type(self.getArgument('logfile_batch_size')) is int:
+      self.logfile_batch_size = max(1, self.getArgument('logfile_batch_size'))
+    if type(self.getArgument('logfile_flush_interval')) in [int, float]:
+      self.logfile_flush_interval = max(0.01, self.getArgument('logfile_flush_interval'))
+    self.logfile_queue = queue.Queue()
+    self.logfile_writer = threading.Thread(target=self.runLogFileWriter, name='LogFileWriter', daemon=True)
+    self.logfile_writer.start()
+    self.debug('Log to file: Writing logfile from background thread.')
+
+  def runLogFileWriter(self):
+    last_flush = time.monotonic()
+    running = True
+    while running:
+      # Wait for a record, but wake up in time to flush written records to disk
+      try:
+        batch = [self.logfile_queue.get(timeout=self.logfile_flush_interval)]
+      except queue.Empty:
+        batch = []
+      # Collect what is waiting, up to the batch size
+      while len(batch) < self.logfile_batch_size:
+        try:
+          batch.append(self.logfile_queue.get_nowait())
+        except queue.Empty:
+          break
+      # None is queued by close() to stop the writer after all other records
+      if None in batch:
+        running = False
+        batch = [rows for rows in batch if rows is not None]
+        self.logfile_queue.task_done()
+      try:
+        # Records queued before a failure are discarded with the rest
+        if len(batch) > 0 and self.logfile_target is not None:
+          self.writeLogFileRows(batch)
+        if self.logfile is not None and (not running or time.monotonic() - last_flush >= self.logfile_flush_interval):
+          self.logfile.flush()
+          last_flush = time.monotonic()
+      except Exception as error:
+        self.stopLogFile(error)
+      finally:
+        # Mark the batch as handled, so beforeFork() can wait for the queue to be empty
+        for rows in batch:
+          self.logfile_queue.task_done()
+
+  ### Stop logfile
+  #   @description stops logfile output after the background writer failed to write. The writer
+  #                keeps taking records off the queue, so nothing waits for it forever.
+  #                The error is reported on stderr, since the log itself may be what failed.
+  def stopLogFile(self, error):
+    target = self.logfile_target
+    self.logfile_target = None
+    if self.logfile is not None:
+      try:
+        self.logfile.close()
+      except Exception:
+        pass
+      self.logfile = None
+    sys.stderr.write(str(datetime.now())[:-4] + ' (Warning): Log to file: Stopped writing \'' + str(target) + '\': ' + str(error) + "\n")
+    sys.stderr.flush()
 
   def getLogFile(self):
     if self.logfile is None:
       self.logfile = open(self.logfile_target, self.logfile_write_mode)
-      if self.min_logfile_level >= 3:
+      # The run information lines are only part of the readable text format
+      if self.min_logfile_level >= 3 and self.logfile_format == 'text':
         self.logfile.write(str(datetime.now())[:-4] + ': Running app \'' + self.framework.getAppName() + '\' in \'' + str(self.getPath()) + "'\n")
-      if self.min_logfile_level == 5:
+      if self.min_logfile_level == 5 and self.logfile_format == 'text':
         self.logfile.write(str(datetime.now())[:-4] + ': $ \'' + ' '.join(sys.argv) + '\'.' + "\n")
+      # Keep track of size and date for rotation
+      self.logfile_size = self.logfile.tell()
+      self.logfile_date = date.today()
     return self.logfile
 
-  def getTextualLevel(self, level):
-    if self.getArgument('coloured') == True:
+  ### Prepare format
+  #   @description resolves level names and display prefixes once, so printing a record does not
+  #                need to look up configuration. Called by Config when 'coloured' changes.
+  def prepareFormat(self, coloured=False):
+    self.textual_levels = { level: self.getTextualLevel(level, coloured=coloured) for level in range(1, 6) }
+    self.display_prefixes = {}
+    for level in range(1, 6):
+      if level == 2:
+        self.display_prefixes[level] = ('', '')
+      else:
+        # Following lines are indented to the width of the visible prefix, without colour codes
+        self.display_prefixes[level] = ('[' + self.textual_levels[level] + '] ',
+                                        ' ' * len('[' + self.getTextualLevel(level, coloured=False) + '] '))
+
+  def getTextualLevel(self, level, coloured=None):
+    if coloured is None:
+      return self.textual_levels[level] if level in self.textual_levels else self.textual_levels[5]
+    if coloured == True:
       if level == 1:
         return "\033[91m" + ' ERROR ' + "\x1B[0m"
       elif level == 2:
@@ -139,62 +525,106 @@ class Logging(Boilerplate):
   ##  Log Buffer
   ### Add
   #   @description adds content to the log buffer, addes log-level and date/time
-  #   @arguments content (string|list)
+  #                Content that will not be shown or written is discarded before any processing.
+  #                Content can be a callable, which is only called when the content is kept, or
+  #                a %-style template that is formatted with args when the content is kept.
+  #   @arguments content (string|list|callable)
   #              level (integer) [1:5]
+  #              args (any) values for %-style formatting of content
+  #              module (string) name of the class that added the content
+  #              key (string) groups similar content for rate limiting, defaults to the template
   #   @output (boolean)
-  def add(self, content='', level=4):
+  def add(self, content='', level=4, *args, module=None, key=None):
+    # Discard content that no output will show
+    if level > self.min_emit_level:
+      return True
+    # Discard repeated warnings, notices and debug messages over the rate limit
+    if self.rate_limit is not None and level > 2:
+      key = key if key is not None else content
+      if type(key) is str and self.isRateLimited(key, level):
+        return True
+    # Resolve lazy content
+    if callable(content):
+      content = content()
+    if len(args) > 0:
+      content = content % args
     # Normalize input
     level = self.normalize_level(level)
     content = self.normalize_content(content)
-    # Add normalized content to display-buffer
-    self.buffer.append( { 'content': content,
-                          'level': level,
-                          'datetime': datetime.now() # Use datetime and not framework date module 
-                                                     # because timing keeps changing.
-                        } )
-    # Add normalized content to file-buffer
-    self.file_buffer.append( { 'content': content,
-                               'level': level,
-                               'datetime': datetime.now() # Use datetime and not framework date module 
-                                                          # because timing keeps changing.
-                            } )
-    # Flush display buffer if max buffer size is reached
-    if len(self.buffer) > self.max_display_buffer_size:
+    # Add normalized content to the buffer. The record is shared by the display and file output.
+    record = { 'content': content,
+               'level': level,
+               'datetime': datetime.now(), # Use datetime and not framework date module 
+                                           # because timing keeps changing.
+               'module': module,
+             }
+    # A forked worker process sends its records to the parent process
+    if self.process_child:
+      self.process_queue.put(record)
+      return True
+    return self.addRecord(record)
+
+  def addRecord(self, record):
+    self.buffer.append(record)
+    self.buffer_bytes += sum(map(len, record['content']))
+    # Wake the flusher when the first record enters the buffer
+    if len(self.buffer) == 1:
+      self.display_pending.set()
+    # Flush buffer if max buffer size is reached
+    if len(self.buffer) > self.max_display_buffer_size or self.buffer_bytes > self.max_display_buffer_bytes \
+       or len(self.buffer) >= self.max_buffer_size:
       self.flush()
     return True
   
   ### Flush
   #   @description pushes all of the log buffer to the output channel(s) 
-  #                if the log level is high enough and clears the pushed lines.
+  #                if the log level is high enough and removes the pushed lines.
   #   @input None
   #   @output (boolean)
   def flush(self) -> True:
-    for row in self.buffer:
-      # Process displaying content to screen
-      if row['level'] <= self.min_log_level:
-        self.sendLineToDisplay(row)
-      # Process writing content to file
-      if row['level'] <= self.min_logfile_level:
-        self.sendLineToLogFile(row)
-      elif self.min_logfile_level == 0 and row['level'] == 2:
-        self.sendLineToLogFile(row)
-    self.buffer = []
+    with self.flush_lock:
+      # Report suppressed messages with the records that are flushed
+      if self.rate_limit is not None:
+        self.addRateLimitSummary()
+      display = []
+      while len(self.buffer) > 0:
+        row = self.buffer.popleft()
+        # Process displaying content to screen
+        if row['level'] <= self.min_log_level:
+          display.append(self.getDisplayText(row))
+        # Process writing content to file
+        if row['level'] <= self.min_logfile_level:
+          self.sendLineToLogFile(row)
+        elif self.min_logfile_level == 0 and row['level'] == 2:
+          self.sendLineToLogFile(row)
+      self.buffer_bytes = 0
+      # Send all displayed content with a single write
+      if len(display) > 0:
+        sys.stdout.write(''.join(display))
+        sys.stdout.flush()
+    return True
 
   ##  Shortcuts
   #   These shortcuts can be used to quickly add a message to the log without worrying about
   #   log levels. 
-  def throw_error(self, content):
-    self.add(content, 1)
+  #   Content can be passed lazily, see add().
+  #   The level is checked before calling add(), since passing arguments on is the main cost of
+  #   a discarded record.
+  def throw_error(self, content, *args, module=None):
+    self.add(content, 1, *args, module=module)
     self.flush()
     sys.exit(str(datetime.now())[:-4] + ' Stopping application because of error.')
-  def print(self, content):
-    self.add(content, 2)
-  def throw_warning(self, content):
-    self.add(content, 3)
-  def throw_notice(self, content):
-    self.add(content, 4)
-  def debug(self, content):
-    self.add(content, 5)
+  def print(self, content, *args, module=None):
+    self.add(content, 2, *args, module=module)
+  def throw_warning(self, content, *args, module=None, key=None):
+    if 3 <= self.min_emit_level:
+      self.add(content, 3, *args, module=module, key=key)
+  def throw_notice(self, content, *args, module=None, key=None):
+    if 4 <= self.min_emit_level:
+      self.add(content, 4, *args, module=module, key=key)
+  def debug(self, content, *args, module=None, key=None):
+    if 5 <= self.min_emit_level:
+      self.add(content, 5, *args, module=module, key=key)
 
   ##  Input validation
   ### Normalize level
@@ -252,28 +682,26 @@ class Logging(Boilerplate):
     if not level == self.min_log_level:
       self.debug('Changed display level from \'' + str(self.min_log_level) + '\' to \'' + str(level) + '\'.')
       self.min_log_level = level
+      self.setEmitLevel()
 
 
 
   ##  Output validation
   def sendLineToDisplay(self, line):
+    sys.stdout.write(self.getDisplayText(line))
+
+  def getDisplayText(self, line):
+    if len(line['content']) == 0:
+      return ''
     # Prepend the first line with characterisation
-    pre = pre = str(line['datetime'])[:-4] + ' ' if line['level'] == 5 else ''
-    pre += '[' + self.getTextualLevel(line['level']) + '] '
-    pre = '' if line['level'] == 2 else pre
-    # Print all lines within the content
-    for row in line['content']:
-      print(pre + row)
-      # Reset the prepend to empty space in the same width as the original content
-      # This ensures that multiline messages are prepended only once.
-      prelen = len(pre)
-      if self.getArgument('coloured'):
-        # Remove the number count for coloured text
-        # -5 for colour set
-        # -4 for reset
-        if pre != ' '*prelen:
-          prelen = prelen - 9
-      pre = ' '*prelen
+    # Following lines are indented, so multiline messages are prepended only once.
+    pre, indent = self.display_prefixes[line['level']]
+    if line['level'] == 5:
+      timestamp = str(line['datetime'])[:-4] + ' '
+      pre = timestamp + pre
+      indent = ' ' * len(timestamp) + indent
+    # Join all lines within the content
+    return pre + ("\n" + indent).join(line['content']) + "\n"
   
   
     
\ No newline at end of file
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+# 
+# Framework Timing Core-Module
+# Measures time spent in named spans and profiles the application
+#
+import sys, os
+import atexit, cProfile, functools, io, pstats, time
+from collections import deque
+
+# Ensure script is embedded and not called directly.
+if __name__ == "__main__":
+      sys.exit('[FATAL] Quitting. Do not call ' + os.path.basename(__file__) + ' directly.')
+
+# Add Local Shared Lib
+importList = [os.path.dirname(os.path.abspath(__file__))]
+for location in importList:
+  if location not in sys.path:
+    sys.path.append(location)
+from boilerplate_framework import FrameworkBoilerplate as Boilerplate
+
+class Timing(Boilerplate):
+  def __init__(self, framework) -> None:
+    # Run Boilerplate initialisation
+    super().__init__(framework)
+    # Prepare reference containers
+    self.profiler        = None   # cProfile instance when --profile is used
+    self.profile_target  = None   # File the profile statistics are written to
+    # Prepare configurable values
+    self.max_samples     = 10000  # Number of most recent durations per span used for percentiles
+    # Prepare data containers
+    self.spans           = {}     # Per span name: {count, wall, cpu, samples}
+    self.summary_enabled = False  # Summary is printed at exit once a span is recorded
+
+  ### Timed
+  #   @description returns a span that can be used as context manager or as decorator.
+  #                with self.timed('read'):           @app.timed('parse')
+  #                  ...                              def parse(rows): ...
+  #                As decorator, the app or module instance has to exist when the function is defined.
+  def timed(self, name):
+    return Span(self, name)
+
+  ### Record
+  #   @description stores the wall and cpu time of one run of a span and sends a debug record
+  def record(self, name, wall, cpu):
+    span = self.spans.get(name)
+    if span is None:
+      span = self.spans[name] = { 'count': 0, 'wall': 0.0, 'cpu': 0.0, 'samples': deque(maxlen=self.max_samples) }
+    span['count'] += 1
+    span['wall'] += wall
+    span['cpu'] += cpu
+    span['samples'].append(wall)
+    self.debug('Timing: %s took %.3f ms (cpu %.3f ms).', name, wall * 1000, cpu * 1000)
+    # Print the summary when the application exits
+    if not self.summary_enabled:
+      self.summary_enabled = True
+      atexit.register(self.showSummary)
+
+  ### Get summary
+  #   @description returns a table with count, total, mean, percentiles and cpu time per span
+  def getSummary(self):
+    rows = [['Span', 'Count', 'Total ms', 'Mean ms', 'P50 ms', 'P95 ms', 'Max ms', 'CPU ms']]
+    for name, span in sorted(self.spans.items(), key=lambda item: item[1]['wall'], reverse=True):
+      samples = sorted(span['samples'])
+      rows.append([name,
+                   str(span['count']),
+                   '%.3f' % (span['wall'] * 1000),
+                   '%.3f' % (span['wall'] / span['count'] * 1000),
+                   '%.3f' % (self.getPercentile(samples, 50) * 1000),
+                   '%.3f' % (self.getPercentile(samples, 95) * 1000),
+                   '%.3f' % (samples[-1] * 1000),
+                   '%.3f' % (span['cpu'] * 1000),
+                  ])
+    # Align columns, names to the left and numbers to the right
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return ['  '.join([row[0].ljust(widths[0])] + [row[column].rjust(widths[column]) for column in range(1, len(row))])
+            for row in rows]
+
+  def getPercentile(self, samples, percentile):
+    # Nearest-rank percentile over sorted samples
+    index = max(0, -(-len(samples) * percentile // 100) - 1)
+    return samples[index]
+
+  def showSummary(self):
+    if len(self.spans) > 0:
+      self.print(['Timing summary:'] + self.getSummary())
+
+  ##  Profiling
+  #   Use --profile [optional: file-reference] to profile the application with cProfile from the
+  #   moment the framework runs until the application exits.
+  def profileInit(self):
+    if self.getArgument('profile'):
+      self.startProfile(target=self.getArgument('profile'))
+
+  def startProfile(self, target=True):
+    if self.profiler is not None:
+      return
+    # If no filename is supplied, use the app name
+    if target is True:
+      target = self.framework.getAppName() + '.prof'
+    self.profile_target = self.getFile(target)
+    self.profiler = cProfile.Profile()
+    self.profiler.enable()
+    atexit.register(self.stopProfile)
+    self.throw_notice('Profile: Writing profile statistics to \'' + self.profile_target.name + '\'.')
+
+  def stopProfile(self):
+    if self.profiler is None:
+      return
+    self.profiler.disable()
+    self.profiler.dump_stats(str(self.profile_target))
+    # Show the functions with the highest cumulative time
+    output = io.StringIO()
+    pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(20)
+    self.print(['Profile: Functions with the highest cumulative time:'] + output.getvalue().strip('\n').split('\n'))
+    self.profiler = None
+
+
+##  Span
+#   Measures wall and cpu time of a block or a function and records it in Timing.
+#   A stack of start times allows nested and recursive use of the same span.
+#   As decorator, every call gets its own span, so calls in different threads do not share a stack.
+class Span:
+  def __init__(self, timing, name) -> None:
+    self.timing = timing
+    self.name   = name
+    self.starts = []
+
+  def __call__(self, function):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+      with Span(self.timing, self.name):
+        return function(*args, **kwargs)
+    return timed
+
+  def __enter__(self):
+    self.starts.append((time.perf_counter(), time.process_time()))
+    return self
+
+  def __exit__(self, *exception):
+    wall, cpu = self.starts.pop()
+    self.timing.record(self.name, time.perf_counter() - wall, time.process_time() - cpu)
+    return False
@@ -1,5 +1,12 @@
 #!/usr/bin/python3
 import sys, os
+import csv, io, locale, mmap, multiprocessing, tempfile
+import bz2, gzip, lzma
+import hashlib, pickle, re, stat
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from collections.abc import Mapping
+from itertools import chain, islice
 from pathlib import Path, PosixPath
 
 # Ensure script is embedded and not called directly.
@@ -15,6 +22,13 @@ for location in importList:
 # Import framework specifics
 from boilerplate_module import ModuleBoilerplate as Boilerplate
 from framework_core import Framework
+# Optional module import
+# zstandard is only needed for .zst compressed files. If the module is not installed,
+# reading or writing .zst files gives a descriptive error message.
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
 
 class readcsv(Boilerplate):
   def __init__(self, framework) -> None:
@@ -30,90 +44,657 @@ class readcsv(Boilerplate):
                                           '|',
                                           "\t",
                                           ]
+    # Parsing engines: csv uses the C-implemented csv.reader, legacy splits lines by hand
+    self.supportedEngines = ['csv', 'legacy']
+    # Writing: number of rows joined per write call and size of the file buffer in bytes
+    self.writeBatchSize = 10000
+    self.writeBufferSize = 1024 * 1024
+    # Compression: detected by suffix, or by the magic bytes at the start of the file
+    self.compressionSuffixes = { '.gz':  'gzip',
+                                 '.bz2': 'bz2',
+                                 '.xz':  'xz',
+                                 '.zst': 'zstd',
+                                }
+    self.compressionMagicBytes = { b'\x1f\x8b':             'gzip',
+                                   b'BZh':                  'bz2',
+                                   b'\xfd7zXZ\x00':         'xz',
+                                   b'\x28\xb5\x2f\xfd':     'zstd',
+                                  }
+    # Seperator detection: number of bytes sampled from the start of the file
+    self.seperatorSampleSize = 64 * 1024
+    # Cache: default directory and size limit in megabytes of the parsed-file cache.
+    # Can be configured with the readcsv_cache_dir and readcsv_cache_size arguments.
+    self.cacheDirectory = Path.home() / '.cache' / 'cmns-framework' / 'readcsv'
+    self.cacheSize = 512
+    # Raise when parsing changes, so results cached by an older version are not used
+    self.cacheVersion = 2
     # Prepare data containers
+    self.seperatorCache = {}
 
-  def read(self, source, header=False):
+  def read(self, source, header=False, stream=False, engine='csv', columnar=False, workers=None, cache=False):
+    # In stream mode, hand out the row iterator so the caller can process files larger
+    # than memory one row at a time.
+    if stream is True:
+      return self.iterRows(source, header=header, engine=engine, workers=workers)
+    # Use a previously parsed result if the source file did not change
+    if cache is True:
+      file = self.verifySource(source, engine=engine)
+      cache_file = self.getCacheFile(file, header=header, engine=engine, columnar=columnar)
+      result = self.readCache(cache_file, file)
+      if result is not None:
+        return result
+    # In columnar mode, store one typed column per key in stead of one dict per row
+    if columnar is True:
+      result = Columns()
+      for row in self.iterRows(source, header=header, engine=engine, workers=workers):
+        result.append(row)
+      result.compact()
+    else:
+      # Collect all rows from the row iterator
+      result = list(self.iterRows(source, header=header, engine=engine, workers=workers))
+    # Store the parsed result for the next run
+    if cache is True:
+      self.writeCache(cache_file, file, result)
+    # Return the parsed result
+    return result
+
+  ### iterRows()
+  #   @arguments     source [string|posixpath], header [bool], engine [string], workers [int]
+  #   @returns       generator of [dict]
+  #   @description   Validates the source file and returns a generator that yields the parsed
+  #                  rows one at a time from the open file handle.
+  #                  Engine 'csv' (default) supports quoted fields, 'legacy' splits lines by hand.
+  #                  With workers > 1 the file is parsed in chunks by a pool of processes.
+  #                  Compressed files (.gz, .bz2, .xz, .zst) are decompressed while reading.
+  def iterRows(self, source, header=False, engine='csv', workers=None):
+    file = self.verifySource(source, engine=engine)
+    # Validation is done up front, parsing is deferred until the rows are requested
+    if type(workers) is int and workers > 1 and self.getCompression(file) is not None:
+      # Byte offsets cannot be used in a compressed stream
+      self.debug('ReadCSV: Compressed file ' + file.name + ' cannot be split in chunks, reading with a single worker.')
+    elif type(workers) is int and workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+      # Spawned workers import the main script again, which would start the app once per worker
+      self.debug('ReadCSV: Worker processes cannot be forked on this platform, reading with a single worker.')
+    elif type(workers) is int and workers > 1:
+      return self.parseRowsParallel(file, header=header, engine=engine, workers=workers)
+    return self.parseRows(file, header=header, engine=engine)
+
+  ### index()
+  #   @arguments     source [string|posixpath], header [bool], engine [string]
+  #   @returns       RowIndex
+  #   @description   Memory-maps the source file and builds an index of line offsets, so row n
+  #                  or a range of rows can be parsed without reading the whole file.
+  def index(self, source, header=False, engine='csv'):
+    file = self.verifySource(source, engine=engine)
+    if self.getCompression(file) is not None:
+      self.throw_error(['ReadCSV: Error when trying to index \'' + str(file) + '\'.', 'Compressed files cannot be memory-mapped.'])
+    self.debug('ReadCSV: Indexing ' + str(file) + ' using the ' + engine + ' engine')
+    with open(file, 'rb') as f:
+      # Detect seperation character and header from the first line, as in parseRows()
+      first_line = self.readFirstLine(file, f).decode(locale.getpreferredencoding(False))
+      seperation_character = self.detectSeperatorCharacter(file)
+      if header == True:
+        header = self.getHeader(next(self.getCellReader([first_line], seperation_character, engine), []))
+      # The mapping stays valid after the file object is closed
+      buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    result = RowIndex(buffer, seperation_character, header=header, engine=engine)
+    self.debug('ReadCSV: Indexed ' + str(len(result)) + ' rows in ' + str(file))
+    return result
+
+  def verifySource(self, source, engine='csv'):
     # Ensure file is PosixPath object
-    if type(source) is not PosixPath:
-      file = Path(source)
+    file = source if type(source) is PosixPath else Path(source)
+    # Look past a compression suffix for the data suffix, so file.csv.gz is supported
+    suffix = file.suffix if file.suffix not in self.compressionSuffixes else Path(file.stem).suffix
     # Verify that file exists
     if not file.exists():
       self.throw_error(['ReadCSV: Error when trying to read \'' + str(file) + '\'.', 'File does not exist.'])
-    elif not file.suffix in ['.csv', '.txt']:
-      self.throw_error(['ReadCSV: Error when trying to read \'' + str(file) + '\'.', 'File suffix \'' + file.suffix + '\' is not supported.'])
+    elif not suffix in ['.csv', '.txt']:
+      self.throw_error(['ReadCSV: Error when trying to read \'' + str(file) + '\'.', 'File suffix \'' + suffix + '\' is not supported.'])
+    # Verify that the parsing engine is supported
+    if engine not in self.supportedEngines:
+      self.throw_error(['ReadCSV: Error when trying to read \'' + str(file) + '\'.', 'Parsing engine \'' + str(engine) + '\' is not supported.',
+                        'Supported engines are: ' + ', '.join(self.supportedEngines)])
+    return file
+
+  def parseRows(self, file, header=False, engine='csv'):
     # Open file
-    self.debug('ReadCSV: Reading ' + str(source))
-    with open(source) as f:
-      # Convert sourcefile to stored list
-      # Use rstrip() to ensure there are no whitespaces in the read line
-      file_contents = [line.rstrip() for line in f]
-    # The file is now stored in file_contents line by line
+    self.debug('ReadCSV: Reading ' + str(file) + ' using the ' + engine + ' engine')
+    # Use newline='' so the csv engine can handle newlines within quoted fields
+    with self.openFile(file, newline='') as f:
+      # Only the first line is needed for separator detection
+      first_line = self.readFirstLine(file, f)
+      seperation_character = self.detectSeperatorCharacter(file)
+      # Split the lines into lists of cells, starting with the already read first line
+      lines = self.getCellReader(chain([first_line], f), seperation_character, engine)
+      # Detect and process header
+      if header == True:
+        header = self.getHeader(next(lines, []))
+      # Process all remaining lines, reading them one at a time from the file handle
+      for line in lines:
+        yield self.parseLine(line, header)
+
+  ### parseRowsParallel()
+  #   @description   Splits the file in chunks at newline-aligned byte offsets, parses the chunks
+  #                  in a ProcessPoolExecutor and yields the rows in file order.
+  #                  Header and seperation character are taken from the first line, as in parseRows().
+  #                  Chunks are split on newlines, so quoted fields should not contain newlines.
+  def parseRowsParallel(self, file, header=False, engine='csv', workers=2):
+    self.debug('ReadCSV: Reading ' + str(file) + ' using the ' + engine + ' engine with ' + str(workers) + ' workers')
+    with open(file, 'rb') as f:
+      # Detect seperation character and header from the first line
+      first_line = self.readFirstLine(file, f).decode(locale.getpreferredencoding(False))
+      seperation_character = self.detectSeperatorCharacter(file)
+      if header == True:
+        header = self.getHeader(next(self.getCellReader([first_line], seperation_character, engine), []))
+        start = f.tell()
+      else:
+        start = 0
+      # Use a few chunks per worker, so a slow chunk does not leave the other workers idle
+      size = os.path.getsize(file)
+      chunk_size = max(1, (size - start) // (workers * 4))
+      offsets = [start]
+      while offsets[-1] < size:
+        # Move the chunk boundary to the start of the next line
+        f.seek(offsets[-1] + chunk_size)
+        f.readline()
+        offsets.append(min(f.tell(), size))
+    # Parse the chunks in parallel. Executor.map returns the results in submission order.
+    # Workers are forked whatever the default start method is, since apps create the app when
+    # the main script is imported.
+    chunks = len(offsets) - 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+      for rows in executor.map(readcsv.parseChunk,
+                               [str(file)] * chunks, offsets[:-1], offsets[1:],
+                               [seperation_character] * chunks, [header] * chunks, [engine] * chunks):
+        yield from rows
+
+  def readFirstLine(self, file, f):
+    first_line = f.readline()
     # Check if file length is >0
-    if len(file_contents) == 0:
-      self.throw_error(['Error while reading file;', str(source) + ' is empty and cannot be read.'])
-    # Prepare parsing result container
-    result = []
-    # Detect seperation character
-    seperation_character = self.guessSeperatorCharacter(file_contents[0])
-    self.debug('ReadCSV: Detected seperation character: ' + seperation_character)
-    # Detect and process header
-    if header == True:
-      # Fetch first line of file as header and split by seperation character
-      building_header = file_contents.pop(0).strip().split(seperation_character)
-      header = {}
-      index = 0
-      # Loop through the fields and normalize
-      while index < len(building_header):
-        # If the column header has content, use content as header name. Else use index
-        header[index] = building_header[index].strip() if len(building_header[index].strip()) > 0 else index
-        index += 1
-    # Process all lines in the read content
-    for line in file_contents:
+    if len(first_line) == 0:
+      self.throw_error(['Error while reading file;', str(file) + ' is empty and cannot be read.'])
+    return first_line
+
+  def getHeader(self, line):
+    # The header is stored as a position table: the key for column n is header[n]
+    header = []
+    # Loop through the fields and normalize
+    for index, column in enumerate(line):
+      # If the column header has content, use content as header name. Else use index
+      column = column.strip()
+      header.append(column if len(column) > 0 else index)
+    return header
+
+  # The parsing steps below do not use the framework, so they can run in worker processes.
+  @staticmethod
+  def parseChunk(file, start, end, seperation_character, header=False, engine='csv'):
+    with open(file, 'rb') as f:
+      f.seek(start)
+      data = f.read(end - start)
+    lines = io.StringIO(data.decode(locale.getpreferredencoding(False)), newline='')
+    return [readcsv.parseLine(line, header) for line in readcsv.getCellReader(lines, seperation_character, engine)]
+
+  @staticmethod
+  def getCellReader(lines, seperation_character, engine='csv'):
+    if engine == 'legacy':
+      # Split lines by hand on the detected seperation character
+      return readcsv.splitLines(lines, seperation_character)
+    reader = csv.reader(lines, **readcsv.getDialect(seperation_character))
+    # Only pass lines that actually have content
+    return (line for line in reader if any(cell.strip() for cell in line))
+
+  # A quoted seperation character such as '";"' translates to delimiter ';' and quotechar '"'
+  @staticmethod
+  def getDialect(seperation_character):
+    if len(seperation_character) == 3:
+      return { 'delimiter': seperation_character[1], 'quotechar': seperation_character[0] }
+    return { 'delimiter': seperation_character }
+
+  @staticmethod
+  def splitLines(lines, seperation_character):
+    for line in lines:
+      line = line.rstrip()
       # Only process lines that actually have content
-      if len(line.replace(seperation_character, '')) > 0:
+      if len(line.replace(seperation_character, '').strip()) > 0:
         # Convert the line into a list based on the previously detected seperation character
-        line = line.strip().split(seperation_character)
-        # Add keys
-        indexed_line = {}
-        # Check if header should be used to store key: value
-        if header == False:
-          # Use column index as key
-          for column in line:
-            indexed_line = { line.index(column): column}
-        else:
-          # Find header name for column index
-          for column in line:
-            if len(column.strip()) > 0:
-              # Verivy that the column has a header
-              if line.index(column) in header:
-                indexed_line[header[line.index(column)]] = column.strip()
-              else:
-                indexed_line[line.index(column)] = column.strip()
-        # Make sure all keys are present in the result
-        for key in header:
-          if header[key] not in indexed_line:
-            indexed_line[header[key]] = ''
-        # Store the parsed result
-        result.append(indexed_line)
-    # Return the parsed result
-    return result
-    
-  def guessSeperatorCharacter(self, line):
+        yield line.strip().split(seperation_character)
+
+  @staticmethod
+  def parseLine(line, header=False):
+    # Check if header should be used to store key: value
+    if header == False:
+      # Use column index as key
+      return dict(enumerate(line))
+    # Find header name for column index in the header position table
+    indexed_line = {}
+    header_length = len(header)
+    for index, column in enumerate(line):
+      column = column.strip()
+      if index < header_length:
+        indexed_line[header[index]] = column
+      elif len(column) > 0:
+        # Columns without a header use the column index as key
+        indexed_line[index] = column
+    # Make sure all keys are present in the result, also when the line is shorter than the header
+    for index in range(len(line), header_length):
+      indexed_line[header[index]] = ''
+    # Return the parsed line
+    return indexed_line
+
+  ### detectSeperatorCharacter()
+  #   @arguments     file [posixpath]
+  #   @returns       [string] seperation character
+  #   @description   Samples the start of the file and guesses the seperation character from the
+  #                  sampled lines. The decision is cached per file, so streaming, parallel and
+  #                  indexed readers of the same file do not sample it again.
+  def detectSeperatorCharacter(self, file):
+    source = file.stat()
+    key = (str(file.resolve()), source.st_size, source.st_mtime_ns)
+    if key not in self.seperatorCache:
+      with self.openFile(file, newline='') as f:
+        sample = f.read(self.seperatorSampleSize)
+      lines = sample.splitlines()
+      # The last line of a full sample is most likely cut off
+      if len(sample) == self.seperatorSampleSize and len(lines) > 1:
+        lines.pop()
+      self.seperatorCache[key] = self.guessSeperatorCharacter(lines)
+      self.debug('ReadCSV: Detected seperation character: ' + self.seperatorCache[key])
+    return self.seperatorCache[key]
+
+  ### guessSeperatorCharacter()
+  #   @arguments     lines [string|list]
+  #   @returns       [string] seperation character
+  #   @description   Scores the supported characters that appear in the first line by how
+  #                  consistently csv.reader splits every line into the same number of fields
+  #                  as the first line. Seperation characters inside quoted fields are not counted.
+  #                  Ties are won by the character listed first in supportedSeperatorCharacters.
+  def guessSeperatorCharacter(self, lines):
+    lines = [lines] if type(lines) is str else lines
+    # Only lines with content are representative
+    lines = [line for line in lines if len(line.strip()) > 0]
+    best_character = None
+    best_score = 0
     for character in self.supportedSeperatorCharacters:
-      if character in line:
-        return character
-    self.throw_error(['ReadCSV: Error when detecting csv-delimiter. No character detected.', 'Supported characters are: ' + ', '.join(self.supportedSeperatorCharacters)])
+      if len(lines) == 0 or character not in lines[0]:
+        continue
+      try:
+        counts = [len(cells) for cells in csv.reader(lines, **self.getDialect(character))]
+      except csv.Error:
+        continue
+      expected = counts[0] if len(counts) > 0 else 0
+      if expected < 2:
+        continue
+      score = sum(1 for count in counts if count == expected) / len(lines)
+      if score > best_score:
+        best_character = character
+        best_score = score
+    if best_character is None:
+      self.throw_error(['ReadCSV: Error when detecting csv-delimiter. No character detected.', 'Supported characters are: ' + ', '.join(self.supportedSeperatorCharacters)])
+    return best_character
+
+  ##  Parsed-file cache
+  #   Parsed results are stored with pickle in the cache directory. A cache file holds the size
+  #   and modification time of the source, followed by the parsed result. When the source
+  #   changes, the cache file is no longer valid and is overwritten on the next read.
+  #   When the cache grows over its size limit, the least recently used files are removed.
+  def getCacheDirectory(self):
+    directory = self.getArgument('readcsv_cache_dir')
+    return Path(directory) if directory is not None else self.cacheDirectory
+
+  def getCacheFile(self, file, **options):
+    # Key the cache file on the source path and the options that change the parsed result
+    key = repr((self.cacheVersion, str(file.resolve()), sorted(options.items())))
+    return self.getCacheDirectory() / (hashlib.sha1(key.encode()).hexdigest() + '.pickle')
+
+  # The cache is shared between runs and processes, and is best-effort: another process may
+  # replace or remove a cache file at any moment. Failing cache access never fails a read.
+  def readCache(self, cache_file, file):
+    source = file.stat()
+    try:
+      with open(cache_file, 'rb') as f:
+        # Only load the parsed result when the source file did not change
+        if pickle.load(f) != (source.st_size, source.st_mtime_ns):
+          self.debug('ReadCSV: Cache for ' + file.name + ' is outdated.')
+          return None
+        result = pickle.load(f)
+    except FileNotFoundError:
+      return None
+    except (OSError, EOFError, pickle.UnpicklingError):
+      self.debug('ReadCSV: Cache for ' + file.name + ' could not be read.')
+      return None
+    # Mark the cache file as recently used
+    try:
+      os.utime(cache_file)
+    except OSError:
+      pass
+    self.debug('ReadCSV: Using cached result for ' + file.name + '.')
+    return result
+
+  def writeCache(self, cache_file, file, result):
+    source = file.stat()
+    temporary = None
+    try:
+      cache_file.parent.mkdir(parents=True, exist_ok=True)
+      # Write to a temporary file first, so concurrent readers never see a partial cache file
+      handle, temporary = tempfile.mkstemp(dir=cache_file.parent, suffix='.tmp')
+      with os.fdopen(handle, 'wb') as f:
+        pickle.dump((source.st_size, source.st_mtime_ns), f, protocol=5)
+        pickle.dump(result, f, protocol=5)
+      os.replace(temporary, cache_file)
+    except (OSError, pickle.PicklingError) as error:
+      self.debug('ReadCSV: Could not store parsed result of ' + file.name + ' in cache: ' + str(error))
+      if temporary is not None and os.path.exists(temporary):
+        try:
+          os.remove(temporary)
+        except OSError:
+          pass
+      return
+    self.debug('ReadCSV: Stored parsed result of ' + file.name + ' in cache.')
+    self.pruneCache(cache_file.parent)
 
+  def pruneCache(self, directory):
+    size = self.getArgument('readcsv_cache_size')
+    limit = (size if type(size) is int else self.cacheSize) * 1024 * 1024
+    # Collect cache files, least recently used first. Files removed by another process meanwhile are skipped.
+    files = []
+    try:
+      with os.scandir(directory) as entries:
+        for entry in entries:
+          if entry.name.endswith('.pickle'):
+            try:
+              result = entry.stat()
+              files.append((result.st_mtime, result.st_size, entry.path))
+            except OSError:
+              pass
+    except OSError:
+      return
+    files.sort()
+    total = sum(file[1] for file in files)
+    for mtime, size, path in files:
+      if total <= limit:
+        break
+      self.debug('ReadCSV: Removing ' + os.path.basename(path) + ' from cache.')
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      total -= size
 
-  def write(self, target=None, data=[], seperator=','):
+  ### getCompression()
+  #   @arguments     file [posixpath], mode [string]
+  #   @returns       [string] compression name or None
+  #   @description   Detects compression from the file suffix. When reading, the magic bytes at
+  #                  the start of the file are checked as well.
+  def getCompression(self, file, mode='r'):
+    if file.suffix in self.compressionSuffixes:
+      return self.compressionSuffixes[file.suffix]
+    if mode[:1] == 'r':
+      with open(file, 'rb') as f:
+        start = f.read(6)
+      for magic, compression in self.compressionMagicBytes.items():
+        if start.startswith(magic):
+          return compression
+    return None
+
+  ### openFile()
+  #   @description   Opens file in text mode, with streaming (de)compression when the file is
+  #                  compressed. Compressed data is never written to disk uncompressed.
+  def openFile(self, file, mode='r', buffering=-1, newline=None, compression=None):
+    compression = compression if compression is not None else self.getCompression(file, mode)
+    mode = mode[:1] + 't'
+    if compression is None:
+      return open(file, mode, buffering=buffering, newline=newline)
+    elif compression == 'gzip':
+      return gzip.open(file, mode, newline=newline)
+    elif compression == 'bz2':
+      return bz2.open(file, mode, newline=newline)
+    elif compression == 'xz':
+      return lzma.open(file, mode, newline=newline)
+    elif zstandard is None:
+      self.throw_error(['ReadCSV: Error when trying to open \'' + str(file) + '\'.', 'Zstandard compression requires the zstandard module. Please run pip3 install zstandard.'])
+    return zstandard.open(file, mode, newline=newline)
+
+  ### write()
+  #   @arguments     target [string|posixpath], data [iterable of lists], seperator [string],
+  #                  buffer_size [int], quoting [bool|int], atomic [bool]
+  #   @returns       posixpath object of the written file
+  #   @description   Writes rows to target in buffered batches. Data can be any iterable or
+  #                  generator, it is never materialised as a whole.
+  #                  Use quoting=True (or a csv.QUOTE_* constant) to write via csv.writer.
+  #                  Use atomic=True to write to a temporary file that replaces target when done.
+  #                  Targets with a .gz, .bz2, .xz or .zst suffix are compressed while writing.
+  def write(self, target=None, data=[], seperator=',', buffer_size=None, quoting=False, atomic=False):
     if target == None:
       self.throw_error('Data was sent to output file but no filename was specified')
-    self.debug(target)
-    self.flush()
     target = self.getFile(target)
-    self.debug(target)
-    self.flush()
-    with open(target, 'w') as f:
-      for line in data:
-        f.write(seperator.join(line) + "\n")
-    f.close() 
\ No newline at end of file
+    buffer_size = buffer_size if type(buffer_size) is int and buffer_size > 0 else self.writeBufferSize
+    self.debug('ReadCSV: Writing ' + str(target) + ('' if atomic is not True else ' via temporary file'))
+    # Write to a temporary file in the target directory, so the rename is atomic
+    if atomic is True:
+      handle, file = tempfile.mkstemp(dir=target.parent, prefix='.' + target.name + '.', suffix='.tmp')
+      os.close(handle)
+      file = Path(file)
+    else:
+      file = target
+    try:
+      with self.openFile(file, 'w', buffering=buffer_size, newline='', compression=self.getCompression(target, 'w')) as f:
+        self.writeRows(f, data, seperator=seperator, quoting=quoting)
+      if atomic is True:
+        # mkstemp creates the file with mode 0600, give it the mode the target has or would get
+        os.chmod(file, self.getFileMode(target))
+        os.replace(file, target)
+    except BaseException:
+      # Do not leave half written temporary files behind
+      if atomic is True and os.path.exists(file):
+        os.remove(file)
+      raise
+    return target
+
+  # Mode of an existing file, or the mode a new file gets under the current umask
+  def getFileMode(self, file):
+    try:
+      return stat.S_IMODE(os.stat(file).st_mode)
+    except FileNotFoundError:
+      umask = os.umask(0)
+      os.umask(umask)
+      return 0o666 & ~umask
+
+  def writeRows(self, f, data, seperator=',', quoting=False):
+    rows = iter(data)
+    if quoting is not False:
+      # csv.writer handles quoting of fields containing the seperator, quotes or newlines
+      writer = csv.writer(f, delimiter=seperator, lineterminator="\n",
+                          quoting=csv.QUOTE_MINIMAL if quoting is True else quoting)
+      while True:
+        batch = list(islice(rows, self.writeBatchSize))
+        if len(batch) == 0:
+          break
+        writer.writerows(batch)
+    else:
+      while True:
+        batch = list(islice(rows, self.writeBatchSize))
+        if len(batch) == 0:
+          break
+        f.writelines([seperator.join(line) + "\n" for line in batch])
+
+
+##  Columnar result
+#   Stores parsed rows as one column per key. Columns containing only integers or only
+#   floats are stored as array.array, other columns as list of strings.
+#   Row n is available as lightweight view via result[n], result.toDicts() returns the
+#   list of dicts that readcsv.read() returns by default.
+class Columns:
+  # Only plain numbers are converted, so values like '00123', '1_000' or 'nan' stay text
+  integerPattern = re.compile(r'-?(0|[1-9][0-9]*)')
+  floatPattern   = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+
+  def __init__(self) -> None:
+    # Prepare data containers
+    self.columns = {}
+    self.length  = 0
+
+  def __len__(self):
+    return self.length
+
+  def __getitem__(self, index):
+    # Support negative indexes like a list does
+    if index < 0:
+      index += self.length
+    if index < 0 or index >= self.length:
+      raise IndexError('Columns: Row index out of range.')
+    return ColumnRow(self, index)
+
+  def __iter__(self):
+    for index in range(self.length):
+      yield ColumnRow(self, index)
+
+  def keys(self):
+    return list(self.columns.keys())
+
+  def column(self, key):
+    return self.columns[key]
+
+  ### append()
+  #   @arguments     row [dict]
+  #   @description   Adds a parsed row to the columns. Keys that are new to the columns are
+  #                  padded with empty values for the previous rows.
+  def append(self, row):
+    for key in row:
+      if key not in self.columns:
+        self.columns[key] = [''] * self.length
+    for key, column in self.columns.items():
+      column.append(row.get(key, ''))
+    self.length += 1
+
+  ### compact()
+  #   @description   Converts columns to array.array when all values are plain integers ('q') or
+  #                  plain decimal numbers ('d'). Other columns are kept as list of strings.
+  def compact(self):
+    for key, column in self.columns.items():
+      if type(column) is not list or len(column) == 0:
+        continue
+      for typecode, cast, pattern in (('q', int, self.integerPattern), ('d', float, self.floatPattern)):
+        if all(type(value) is str and pattern.fullmatch(value) for value in column):
+          try:
+            self.columns[key] = array(typecode, map(cast, column))
+            break
+          except OverflowError:
+            pass
+    return self
+
+  def toDict(self, index):
+    return { key: column[index] for key, column in self.columns.items() }
+
+  def toDicts(self):
+    return [self.toDict(index) for index in range(self.length)]
+
+
+# A read-only Mapping, so a row view can be used where a row dict was used
+class ColumnRow(Mapping):
+  # Only store a reference and an index, so a row view costs next to no memory
+  __slots__ = ('columns', 'index')
+
+  def __init__(self, columns, index) -> None:
+    self.columns = columns
+    self.index   = index
+
+  def __getitem__(self, key):
+    return self.columns.columns[key][self.index]
+
+  def __contains__(self, key):
+    return key in self.columns.columns
+
+  def __iter__(self):
+    return iter(self.columns.columns)
+
+  def __len__(self):
+    return len(self.columns.columns)
+
+  def __repr__(self):
+    return repr(self.toDict())
+
+  def toDict(self):
+    return self.columns.toDict(self.index)
+
+
+##  Row index
+#   Holds a memory-mapped csv file and the byte offsets of its rows. Rows are only decoded
+#   and parsed when requested, so random access and re-reads are left to the page cache.
+class RowIndex:
+  def __init__(self, buffer, seperation_character, header=False, engine='csv') -> None:
+    # Prepare reference containers
+    self.buffer               = buffer
+    self.seperation_character = seperation_character
+    self.header               = header
+    self.engine               = engine
+    self.encoding             = locale.getpreferredencoding(False)
+    # Prepare data containers
+    self.starts               = array('q')
+    self.ends                 = array('q')
+    # Initialisation
+    self.buildIndex()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *arguments):
+    self.close()
+
+  def __len__(self):
+    return len(self.starts)
+
+  def __getitem__(self, index):
+    if type(index) is slice:
+      start, stop, step = index.indices(len(self))
+      # Contiguous rows are parsed from one slice of the file
+      if step == 1:
+        return self.getRows(start, stop)
+      return [self.getRow(row) for row in range(start, stop, step)]
+    return self.getRow(index)
+
+  def __iter__(self):
+    for index in range(len(self)):
+      yield self.getRow(index)
+
+  def buildIndex(self):
+    # Characters that make up an empty line, which is skipped like readcsv.read() does
+    empty = (self.seperation_character + " \t\r\n").encode(self.encoding)
+    buffer = self.buffer
+    size = len(buffer)
+    start = 0
+    while start < size:
+      end = buffer.find(b'\n', start)
+      if end == -1:
+        end = size
+      if len(buffer[start:end].strip(empty)) > 0:
+        self.starts.append(start)
+        self.ends.append(end)
+      start = end + 1
+    # With a header, the first line is not a row
+    if self.header is not False and len(self.starts) > 0:
+      del self.starts[0]
+      del self.ends[0]
+
+  ### getRow()
+  #   @arguments     index [int]
+  #   @returns       [dict]
+  #   @description   Parses row n of the file. Supports negative indexes like a list does.
+  def getRow(self, index):
+    line = self.buffer[self.starts[index]:self.ends[index]].decode(self.encoding)
+    return readcsv.parseLine(next(readcsv.getCellReader([line], self.seperation_character, self.engine), []), self.header)
+
+  ### getRows()
+  #   @arguments     start [int], stop [int]
+  #   @returns       list of [dict]
+  #   @description   Parses rows start up to stop from one contiguous slice of the file.
+  def getRows(self, start=0, stop=None):
+    stop = len(self) if stop is None else min(stop, len(self))
+    if start >= stop:
+      return []
+    lines = self.buffer[self.starts[start]:self.ends[stop - 1]].decode(self.encoding)
+    lines = io.StringIO(lines, newline='')
+    return [readcsv.parseLine(line, self.header) for line in readcsv.getCellReader(lines, self.seperation_character, self.engine)]
+
+  def close(self):
+    self.buffer.close()